@@ -1,11 +1,41 @@
 # rss_to_slack.py
-import os, sys, time, re, traceback
-from typing import Optional, Dict, Any
+import os, sys, time, re, json, hashlib, calendar, traceback
+import codecs, html
+import email.utils
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from datetime import datetime, timedelta, timezone
 
 import requests
 import feedparser
-from dateutil import parser as dateparser
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from dateutil import parser as dateparser  # 定型外の日付文字列の最終手段
+except ImportError:
+    dateparser = None
+# 重複投稿防止の要なので必須依存（無い場合に黙って重複投稿するより import で落とす）
+from pybloom_live import ScalableBloomFilter
+try:
+    # libxml2 のSAXドライバがあれば feedparser の XML 解析に使う
+    import drv_libxml2  # noqa: F401
+    feedparser.PREFERRED_XML_PARSERS = ["drv_libxml2"]
+except ImportError:
+    pass
+try:
+    from lxml import etree  # 必要な項目だけ逐次取り出す軽量パーサ（無ければ feedparser のみ）
+except ImportError:
+    etree = None
+try:
+    # C実装のHTMLパーサ（lexbor を優先。selectolax 1.0 以降 Modest 版は import できない）
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None  # 無ければ正規表現で代替
 
 UTC = timezone.utc
 
@@ -14,22 +44,85 @@ FEED_URLS = (os.getenv("FEED_URLS") or "").strip()
 WEBHOOK   = (os.getenv("SLACK_WEBHOOK_URL") or "").strip()
 WINDOWMIN = int((os.getenv("POST_WINDOW_MIN") or "1440").strip())   # 既定24h
 MAX_POSTS = int((os.getenv("MAX_POSTS") or "30").strip())           # 既定30件/実行
+# 1メッセージに束ねる件数。1バッチで 2n-1 ブロック使い、Slack の上限は50ブロックなので最大25
+BATCH_SIZE = min(25, max(1, int((os.getenv("BATCH_SIZE") or "10").strip())))
 DRY_RUN   = (os.getenv("DRY_RUN") or "").lower() in ("1","true","yes","on")
+SORTED_DESC = (os.getenv("FEED_SORTED_DESC") or "true").lower() in ("1","true","yes","on")  # 新しい順なら古い記事で打ち切り
+SORTED_MIN_DATED = 3  # 新しい順と判断するのに必要な、降順に並んだ日付付き記事の数
+CACHE_FILE = (os.getenv("FEED_CACHE_FILE") or "feed_cache.json").strip()  # ETag/Last-Modified の保存先
+SEEN_FILE = (os.getenv("SEEN_FILE") or "seen.bloom").strip()        # 投稿済み記事ID（Bloom filter）の保存先
+
+# Slack投稿用のセッション（同一ホストへの接続を使い回してTLSハンドシェイクを削減）
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=4,
+    # 再送は接続確立の失敗時のみ。読み取りタイムアウトや5xxはSlack側で受理済みの
+    # 可能性があり、再送すると同じバッチが二重投稿される（429 は post_to_slack で処理）
+    max_retries=Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.3),
+))
+SESSION.headers.update({"Connection": "keep-alive"})
+
+# フィード取得用のセッション（全フィード・全スレッドで接続プールを共有し keep-alive で再利用）
+FEED_SESSION = requests.Session()
+_feed_adapter = HTTPAdapter(
+    pool_connections=10,  # 保持するホスト数
+    pool_maxsize=20,      # ホストあたりの接続数（並列ワーカー数16より多く）
+    max_retries=Retry(total=2, backoff_factor=0.3,
+                      status_forcelist=[500, 502, 503, 504]),
+)
+FEED_SESSION.mount("https://", _feed_adapter)
+FEED_SESSION.mount("http://", _feed_adapter)
+FEED_SESSION.headers.update({"User-Agent": feedparser.USER_AGENT})
+
+# strip_html のフォールバック用。エントリ毎に呼ばれるので事前コンパイル
+_TAG_RE  = re.compile(r"<[^>]+>")
+_NBSP_RE = re.compile(r"&nbsp;?")
+_WS_RE   = re.compile(r"\s+")
 
-if not FEED_URLS or not WEBHOOK:
-    print("FEED_URLS / SLACK_WEBHOOK_URL が未設定です。", file=sys.stderr)
-    sys.exit(1)
+STRIP_HTML_MAX = 2000  # strip_html の出力上限（どちらの経路でも同じ）
 
 def strip_html(s: str) -> str:
     if not s: return ""
-    s = re.sub(r"<[^>]+>", " ", s)
-    s = re.sub(r"&nbsp;?", " ", s)
-    return re.sub(r"\s+", " ", s).strip()
+    return _strip_html(s)[:STRIP_HTML_MAX]
+
+def _strip_html(s: str) -> str:
+    if HTMLParser is not None:
+        try:
+            # 1パスでテキスト化し、&amp; などの実体参照も復号される
+            return " ".join(HTMLParser(s).text(separator=" ").split())
+        except Exception:
+            pass
+    s = _TAG_RE.sub(" ", s)
+    s = _NBSP_RE.sub(" ", s)
+    return _WS_RE.sub(" ", html.unescape(s)).strip()
 
-def post_to_slack(text: str) -> bool:
-    """Slackにプレーンテキストを投稿。失敗時はstderrに詳細を出す。"""
+RETRY_AFTER_MAX = 5.0  # 429 時に待つ秒数の上限
+
+def retry_after_seconds(value: Optional[str]) -> float:
+    """Retry-After（秒数 or HTTP-date）を待ち秒数にする。読めなければ1秒、上限 RETRY_AFTER_MAX。"""
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        try:
+            wait = (email.utils.parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds()
+        except (TypeError, ValueError):
+            wait = 1.0
+    if wait != wait:  # NaN
+        wait = 1.0
+    return min(max(wait, 0.0), RETRY_AFTER_MAX)
+
+def post_to_slack(text: str, blocks: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """Slackに投稿（blocks指定時はBlock Kit、textは通知用フォールバック）。失敗時はstderrに詳細を出す。"""
+    payload: Dict[str, Any] = {"text": text}
+    if blocks:
+        payload["blocks"] = blocks
     try:
-        resp = requests.post(WEBHOOK, json={"text": text}, timeout=20)
+        resp = SESSION.post(WEBHOOK, json=payload, timeout=20)
+        if resp.status_code == 429:
+            # レート制限に掛かった時だけ指示された秒数待って1回だけ再送
+            time.sleep(retry_after_seconds(resp.headers.get("Retry-After")))
+            resp = SESSION.post(WEBHOOK, json=payload, timeout=20)
         if 200 <= resp.status_code < 300:
             return True
         print(f"Slack post failed: {resp.status_code} {resp.text}", file=sys.stderr)
@@ -37,43 +130,272 @@ def post_to_slack(text: str) -> bool:
         print(f"Slack post error: {e}", file=sys.stderr)
     return False
 
-def parse_pubdate(entry: Dict[str, Any]) -> Optional[datetime]:
-    # feedparserが用意する time.struct_time 優先
+def _as_utc(dt: datetime) -> datetime:
+    """tzinfoなしはUTCとみなしてUTCに正規化。"""
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+# 機械生成の RFC-822 日付（例: "Wed, 02 Oct 2024 12:34:56 GMT"）を1パスで読む
+_RFC822_RE = re.compile(
+    r"^(?:\w{3},\s*)?(\d{1,2})\s+(\w{3})\s+(\d{4})\s+(\d{2}):(\d{2})(?::(\d{2}))?"
+    r"\s*(GMT|UTC?|Z|[+-]\d{4})?\s*$"
+)
+_MONTHS = {m: i for i, m in enumerate(
+    ("Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"), 1)}
+
+def _parse_rfc822(s: str) -> Optional[datetime]:
+    m = _RFC822_RE.match(s)
+    if not m or m.group(2) not in _MONTHS:
+        return None
+    d, mo, y, h, mi, se, tz = m.groups()
+    dt = datetime(int(y), _MONTHS[mo], int(d), int(h), int(mi), int(se or 0), tzinfo=UTC)
+    if tz and tz[0] in "+-":
+        # 数値オフセット分を戻してUTCにする
+        off = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+        dt = dt - off if tz[0] == "+" else dt + off
+    return dt
+
+@lru_cache(maxsize=4096)
+def _parse_date_str(s: str) -> Optional[datetime]:
+    """日付文字列をUTCに変換（正規表現 → ISO-8601 → email.utils → dateutil の順に軽い方から試す）。
+    同じ記事が複数フィードに載ることがあるので結果をキャッシュする。"""
+    try:
+        dt = _parse_rfc822(s)
+        if dt:
+            return dt
+    except ValueError:  # 日付として不正（31日のない月など）
+        pass
+    try:
+        return _as_utc(datetime.fromisoformat(s.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    try:
+        return _as_utc(email.utils.parsedate_to_datetime(s))
+    except (TypeError, ValueError):
+        pass
+    if dateparser is None:
+        return None
+    try:
+        return _as_utc(dateparser.parse(s))
+    except Exception:
+        return None
+
+def entry_epoch(entry: Dict[str, Any]) -> Optional[float]:
+    """記事の公開日時をUNIX秒で返す。窓判定だけなら datetime を作らずに済む。"""
+    # feedparserが用意する time.struct_time 優先（UTC 前提）
     for key in ("published_parsed","updated_parsed"):
-        t = getattr(entry, key, None) if hasattr(entry, key) else entry.get(key)
-        if t:  # struct_time -> datetime (UTC 前提)
-            return datetime(*t[:6], tzinfo=UTC)
+        t = entry.get(key)
+        if t:
+            return float(calendar.timegm(t[:6]))
     # 文字列日付を解釈
     for key in ("published","updated","created"):
         s = entry.get(key)
         if not s: 
             continue
-        try:
-            dt = dateparser.parse(s)
-            if not dt.tzinfo:
-                dt = dt.replace(tzinfo=UTC)
-            return dt.astimezone(UTC)
-        except Exception:
-            pass
+        dt = _parse_date_str(s)
+        if dt:
+            return dt.timestamp()
     return None
 
+def slack_escape(s: str) -> str:
+    """Slack の制御文字をエスケープ（フィード由来の <!channel> や <url|偽リンク> を無効化）。"""
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
 def make_item_text(entry: Dict[str, Any]) -> str:
-    title   = entry.get("title") or "(no title)"
-    link    = entry.get("link") or ""
+    title   = slack_escape(entry.get("title") or "(no title)")
+    link    = slack_escape(entry.get("link") or "")
     summary = strip_html(entry.get("summary") or entry.get("description") or "")
-    txt = f"*New:* {title}\n{link}"
-    if summary:
-        txt += f"\n{summary[:300]}{'…' if len(summary) > 300 else ''}"
-    return txt
+    if not summary:
+        return f"*New:* {title}\n{link}"
+    short = summary if len(summary) <= 300 else summary[:300] + "…"
+    return f"*New:* {title}\n{link}\n{slack_escape(short)}"
+
+def post_batch(texts: List[str]) -> bool:
+    """複数記事を1メッセージ（Block Kit: 記事ごとのsection + divider）にまとめて投稿。"""
+    blocks: List[Dict[str, Any]] = []
+    for t in texts:
+        if blocks:
+            blocks.append({"type": "divider"})
+        blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": t}})
+    return post_to_slack("\n\n---\n\n".join(texts), blocks=blocks)
+
+def load_feed_cache() -> Dict[str, Dict[str, Optional[str]]]:
+    """前回実行時の ETag / Last-Modified を読み込む。無い・壊れている場合は空。"""
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Feed cache load error: {e}", file=sys.stderr)
+        return {}
+
+def save_feed_cache(cache: Dict[str, Dict[str, Optional[str]]]) -> None:
+    try:
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+    except Exception as e:
+        print(f"Feed cache save error: {e}", file=sys.stderr)
+
+def load_seen() -> ScalableBloomFilter:
+    """投稿済み記事IDの Bloom filter を読み込む（1件あたり数バイトで履歴が伸びても軽い）。
+    キャッシュ経由で持ち回るファイルなので pickle は使わず、パラメータとビット列だけを読む。"""
+    try:
+        with open(SEEN_FILE, "rb") as f:
+            return ScalableBloomFilter.fromfile(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Seen file load error: {e}", file=sys.stderr)
+    return ScalableBloomFilter(initial_capacity=10000, error_rate=1e-5)
+
+def save_seen(seen: ScalableBloomFilter) -> None:
+    try:
+        with open(SEEN_FILE, "wb") as f:
+            seen.tofile(f)
+    except Exception as e:
+        print(f"Seen file save error: {e}", file=sys.stderr)
+
+def entry_id(entry: Dict[str, Any], text: str) -> str:
+    return entry.get("id") or entry.get("link") or hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+_ATOM    = "{http://www.w3.org/2005/Atom}"
+_RSS1    = "{http://purl.org/rss/1.0/}"
+_RDF     = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+_DC      = "{http://purl.org/dc/elements/1.1/}"
+_CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+
+_CHARSET_RE  = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_XML_DECL_RE = re.compile(rb"^\s*<\?xml[^>]*?encoding\s*=\s*[\"']([\w.:-]+)", re.I)
+
+def _codec_name(name: Optional[str]) -> Optional[str]:
+    try:
+        return codecs.lookup(name).name if name else None
+    except LookupError:
+        return None
+
+def _atom_text(elem: Any, tag: str) -> Optional[str]:
+    # type="xhtml" は本文が子要素に入るので、子孫のテキストをまとめて取る
+    child = elem.find(tag)
+    return "".join(child.itertext()) if child is not None else None
+
+def _atom_link(elem: Any) -> Optional[str]:
+    for link in elem.iterfind(_ATOM + "link"):
+        if link.get("rel", "alternate") == "alternate":
+            return link.get("href")
+    return None
+
+def iter_feed(xml: bytes, encoding: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """RSS/Atom から使う項目（id, title, link, summary, 日付）だけを逐次取り出す。
+    キーは feedparser のエントリに合わせてあり、処理済みの要素は都度捨てるので
+    DOM や未使用の項目は保持しない（レスポンス本文自体は取得時に全て読み込み済み）。
+    encoding を指定するとXML宣言より優先する（HTTPヘッダの charset 用）。"""
+    for _, elem in etree.iterparse(BytesIO(xml), events=("end",),
+                                   tag=("item", _RSS1 + "item", _ATOM + "entry"),
+                                   resolve_entities=False, encoding=encoding):
+        if elem.tag == _ATOM + "entry":
+            entry = {
+                "id":        elem.findtext(_ATOM + "id"),
+                "title":     _atom_text(elem, _ATOM + "title"),
+                "link":      _atom_link(elem),
+                "summary":   _atom_text(elem, _ATOM + "summary") or _atom_text(elem, _ATOM + "content"),
+                "published": elem.findtext(_ATOM + "published"),
+                "updated":   elem.findtext(_ATOM + "updated"),
+            }
+        else:
+            ns = _RSS1 if elem.tag == _RSS1 + "item" else ""
+            entry = {
+                "id":        elem.findtext("guid") or elem.get(_RDF + "about"),
+                "title":     elem.findtext(ns + "title"),
+                "link":      elem.findtext(ns + "link"),
+                # feedparser と同様、description が無ければ content:encoded を使う
+                "summary":   elem.findtext(ns + "description") or elem.findtext(_CONTENT + "encoded"),
+                "published": elem.findtext("pubDate") or elem.findtext(_DC + "date"),
+            }
+        # 処理済みの要素と前の兄弟を解放してメモリを一定に保つ
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+        yield {k: v.strip() for k, v in entry.items() if v and v.strip()}
+
+def parse_entries(content: bytes, headers: Dict[str, str]) -> List[Any]:
+    """lxml で軽量に解析し、壊れたXMLや未対応形式（記事0件）は寛容な feedparser に任せる。
+    件数集計と途中で壊れていた場合の feedparser への切り替えのため、記事はリストにして返す。
+    headers のキーは小文字（'content-type'）。"""
+    m = _CHARSET_RE.search(headers.get("content-type", ""))
+    charset = m.group(1) if m else None  # libxml2 に渡すのでヘッダの表記のまま
+    d = _XML_DECL_RE.match(content[:200])
+    declared = d.group(1).decode("ascii") if d else None
+    # ヘッダの charset とXML宣言が食い違う場合は判定規則を持つ feedparser に任せる
+    conflict = bool(charset and declared and _codec_name(charset) != _codec_name(declared))
+    if etree is not None and not conflict:
+        try:
+            entries = list(iter_feed(content, encoding=charset))
+            if entries:
+                return entries
+        except (etree.XMLSyntaxError, LookupError):
+            pass
+    # 本文HTMLは strip_html でテキスト化するだけなので、相対URL解決とサニタイズは省く
+    feed = feedparser.parse(content, response_headers=headers,
+                            resolve_relative_uris=False, sanitize_html=False)
+    return feed.entries or []
+
+def fetch_feed(url: str, prev: Dict[str, Optional[str]]) -> Tuple[str, Optional[List[Any]], Dict[str, Optional[str]], Optional[Exception]]:
+    """フィードを条件付きGETで取得し記事を取り出す。304 の場合 entries は None。
+    例外は呼び出し側で集計するため返り値で返す。"""
+    headers = {}
+    if prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if prev.get("modified"):
+        headers["If-Modified-Since"] = prev["modified"]
+    try:
+        resp = FEED_SESSION.get(url, headers=headers, timeout=20)
+        if resp.status_code == 304:
+            return url, None, prev, None
+        resp.raise_for_status()
+        validators = {"etag": resp.headers.get("ETag"), "modified": resp.headers.get("Last-Modified")}
+        # feedparser は小文字キー（'content-type'）で charset を引くので小文字化して渡す
+        headers = {k.lower(): v for k, v in resp.headers.items()}
+        return url, parse_entries(resp.content, headers), validators, None
+    except Exception as e:
+        return url, None, prev, e
 
 def main() -> int:
+    if not FEED_URLS or not WEBHOOK:
+        print("FEED_URLS / SLACK_WEBHOOK_URL が未設定です。", file=sys.stderr)
+        return 1
+
     now = datetime.now(UTC)
     cutoff = now - timedelta(minutes=WINDOWMIN)
+    cutoff_epoch = cutoff.timestamp()
     feeds = [u.strip() for u in FEED_URLS.split(",") if u.strip()]
 
     total_posted = 0
-    debug_lines = []
-    err_snippets = []
+    debug_lines: List[str] = []
+    err_snippets: List[str] = []
+    feed_stats = []
+    seen = load_seen()
+    # 投稿待ちの記事（本文, 所属フィードのstats, 記事ID）。BATCH_SIZE件ごとにまとめて送る
+    buffer: List[Tuple[str, Dict[str, int], str]] = []
+
+    def flush() -> None:
+        nonlocal total_posted
+        if not buffer:
+            return
+        ok = True
+        if not DRY_RUN:
+            ok = post_batch([t for t, _, _ in buffer])
+        if ok:
+            for _, st, eid in buffer:
+                st["posted"] += 1
+                seen.add(eid)
+            total_posted += len(buffer)
+        else:
+            for _, st, _ in buffer:
+                st["failed"] += 1
+        buffer.clear()
 
     header = (
         f"[DEBUG] Feed scan summary\n"
@@ -85,55 +407,101 @@ def main() -> int:
     )
     debug_lines.append(header)
 
-    for idx, url in enumerate(feeds, 1):
+    # 取得・解析はIO待ちが支配的なので並列化（投稿は順序維持のため直列）
+    cache = load_feed_cache()
+    results = []
+    if feeds:
+        with ThreadPoolExecutor(max_workers=min(16, len(feeds))) as ex:
+            results = list(ex.map(fetch_feed, feeds, [cache.get(u) or {} for u in feeds]))
+
+    for url, entries, validators, fetch_err in results:
         stats = {
             "total": 0,
             "in_window": 0,
             "posted": 0,
             "skipped_no_date": 0,
             "skipped_old": 0,
-            "errors": 0
+            "skipped_dup": 0,
+            "capped": 0,
+            "failed": 0,
+            "errors": 0,
+            "not_modified": 0
         }
+        feed_stats.append((url, stats, validators))
         try:
-            feed = feedparser.parse(url)
-            entries = feed.entries or []
+            if fetch_err is not None:
+                raise fetch_err
+            if entries is None:
+                # 304: 前回から更新なし
+                stats["not_modified"] = 1
+                continue
             stats["total"] = len(entries)
 
-            for entry in entries:
-                pub = parse_pubdate(entry)
-                if not pub:
+            prev_pub = None
+            dated = 0          # ここまでの日付付き記事数
+            descending = True  # ここまでの日付が新しい順に並んでいるか
+            for i, entry in enumerate(entries):
+                pub = entry_epoch(entry)
+                if pub is None:
                     stats["skipped_no_date"] += 1
                     continue
-                if pub < cutoff:
+                if prev_pub is not None and pub > prev_pub:
+                    descending = False
+                prev_pub = pub
+                dated += 1
+                if pub < cutoff_epoch:
+                    # 古い順のフィードや先頭に古い固定記事があるフィードで打ち切らないよう、
+                    # 降順が数件続いたことを確認できた場合だけ打ち切る
+                    if SORTED_DESC and descending and dated >= SORTED_MIN_DATED:
+                        # 新しい順のフィードなら以降も全て古いので打ち切る
+                        stats["skipped_old"] += len(entries) - i
+                        break
                     stats["skipped_old"] += 1
                     continue
 
                 stats["in_window"] += 1
-                if total_posted >= MAX_POSTS:
+                text = make_item_text(entry)
+                eid = entry_id(entry, text)
+                if eid in seen or any(eid == b for _, _, b in buffer):
+                    # 前回までに投稿済み、または今回別フィードで投稿予定
+                    stats["skipped_dup"] += 1
+                    continue
+                if total_posted + len(buffer) >= MAX_POSTS:
                     # 上限に達したら投稿は打ち切るがカウントは継続
+                    stats["capped"] += 1
                     continue
 
-                text = make_item_text(entry)
-                ok = True
-                if not DRY_RUN:
-                    ok = post_to_slack(text)
-                    time.sleep(0.3)  # スパム防止
-                if ok:
-                    stats["posted"] += 1
-                    total_posted += 1
+                buffer.append((text, stats, eid))
+                if len(buffer) >= BATCH_SIZE:
+                    flush()
 
         except Exception as e:
             stats["errors"] += 1
-            err_snippets.append(f"- {url} -> {repr(e)}")
+            err_snippets.append(f"- {url} -> {repr(e)[:500]}")  # Slackの文字数上限対策
             traceback.print_exc()
 
-        # 各フィードのサマリ行
+    flush()
+
+    # 窓内の記事を全て投稿済み（または既出）にできたフィードだけ ETag/Last-Modified を更新する。
+    # 上限で打ち切った・投稿に失敗した記事は、次回 304 で取りこぼさないよう再取得させる
+    for url, stats, validators in feed_stats:
+        if stats["not_modified"] or stats["errors"] or stats["capped"] or stats["failed"]:
+            continue
+        if validators.get("etag") or validators.get("modified"):
+            cache[url] = validators
+    if not DRY_RUN:
+        save_feed_cache(cache)
+        save_seen(seen)
+
+    # 各フィードのサマリ行（バッチ送信後に確定した posted を反映）
+    for idx, (url, stats, _) in enumerate(feed_stats, 1):
         debug_lines.append(
             f"{idx}) {url}\n"
             f"   result: total={stats['total']}, "
             f"in_window={stats['in_window']}, posted={stats['posted']}, "
-            f"skipped(no_date={stats['skipped_no_date']}, old={stats['skipped_old']}), "
+            f"skipped(no_date={stats['skipped_no_date']}, old={stats['skipped_old']}, dup={stats['skipped_dup']}), "
             f"errors={stats['errors']}"
+            f"{' (not modified)' if stats['not_modified'] else ''}"
         )
 
     # まとめをSlackへ常に送信（DRY_RUN中も送る）
@@ -142,10 +510,11 @@ def main() -> int:
         debug_lines.append("\n[DEBUG] errors:")
         debug_lines.extend(err_snippets)
 
-    post_to_slack("\n".join(debug_lines))
+    summary = "\n".join(debug_lines)
+    post_to_slack(summary)
 
     # 進捗を標準出力にも
-    print("\n".join(debug_lines))
+    print(summary)
     return 0
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import pytest
+
+import rss_to_slack
+
+
+@pytest.fixture(params=["selectolax", "regex"])
+def html_backend(request, monkeypatch):
+    # どちらのHTML処理経路でも同じ結果になることを確認する
+    if request.param == "regex":
+        monkeypatch.setattr(rss_to_slack, "HTMLParser", None)
+    elif rss_to_slack.HTMLParser is None:
+        pytest.skip("selectolax is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("summary, expected", [
+    ("<p>&lt;!channel&gt;</p>", "&lt;!channel&gt;"),
+    ("&lt;https://evil|click&gt;", "&lt;https://evil|click&gt;"),
+    ("<b>A &amp; B</b>", "A &amp; B"),
+])
+def test_make_item_text_escapes_slack_control_sequences(html_backend, summary, expected):
+    text = rss_to_slack.make_item_text({
+        "title": "<!here> & <https://evil|x>",
+        "link": "https://example.com/?a=1&b=2",
+        "summary": summary,
+    })
+    assert text == (
+        "*New:* &lt;!here&gt; &amp; &lt;https://evil|x&gt;\n"
+        "https://example.com/?a=1&amp;b=2\n"
+        f"{expected}"
+    )
+    assert "<" not in text and ">" not in text
+
+
+def test_strip_html_caps_output_on_every_backend(html_backend):
+    out = rss_to_slack.strip_html("<p>" + "word " * 1000 + "</p>")
+    assert len(out) == rss_to_slack.STRIP_HTML_MAX
+    assert out.startswith("word word")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2", 2.0),
+    (None, 1.0),
+    ("soon", 1.0),
+    ("nan", 1.0),
+    ("-3", 0.0),
+    ("3600", rss_to_slack.RETRY_AFTER_MAX),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),  # 過去の日時
+    ("Fri, 31 Dec 9999 23:59:59 GMT", rss_to_slack.RETRY_AFTER_MAX),
+])
+def test_retry_after_seconds(value, expected):
+    assert rss_to_slack.retry_after_seconds(value) == expected
+
+
+CONTENT_ENCODED_RSS = b"""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>t</title>
+<item><title>only content</title><link>http://a</link><content:encoded><![CDATA[<p>encoded body</p>]]></content:encoded></item>
+<item><title>both</title><link>http://b</link><description>desc body</description><content:encoded><![CDATA[<p>long body</p>]]></content:encoded></item>
+</channel></rss>"""
+
+
+def test_parse_entries_matches_feedparser_summary(monkeypatch):
+    if rss_to_slack.etree is None:
+        pytest.skip("lxml is not installed")
+    lxml_entries = rss_to_slack.parse_entries(CONTENT_ENCODED_RSS, {})
+    monkeypatch.setattr(rss_to_slack, "etree", None)
+    fp_entries = rss_to_slack.parse_entries(CONTENT_ENCODED_RSS, {})
+    assert [type(e) for e in lxml_entries] == [dict, dict]
+    assert [rss_to_slack.make_item_text(e) for e in lxml_entries] == \
+           [rss_to_slack.make_item_text(e) for e in fp_entries]
+    assert rss_to_slack.make_item_text(lxml_entries[0]).endswith("\nencoded body")